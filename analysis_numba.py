@@ -0,0 +1,303 @@
+# analysis_numba.py
+import numpy as np
+
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    # numba is optional; without it Petrinet.analysis uses its NumPy search
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        return lambda f: f
+
+
+@njit(cache=True)
+def _hash_mark(m: np.ndarray, bits: int) -> np.uint64:
+    """
+    Hash a marking.
+
+    If bits is not 0, every place fits into bits bits and the places are packed
+    into one 64 bit word, which is then mixed with the bijective MurmurHash3
+    finalizer. Equal hashes then mean equal markings. Otherwise the hash is
+    64 bit FNV-1a over the raw bytes of the marking.
+
+    Args:
+        m: The marking.
+        bits: The number of bits per place of the packed key, 0 to not pack.
+
+    Returns:
+        The 64 bit hash of the marking.
+    """
+    if bits:
+        h = np.uint64(0)
+        for j in range(m.shape[0]):
+            h |= np.uint64(m[j]) << np.uint64(j * bits)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(0xff51afd7ed558ccd)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(0xc4ceb9fe1a85ec53)
+        h ^= h >> np.uint64(33)
+        return h
+    h = np.uint64(14695981039346656037)
+    for b in m.view(np.uint8):
+        h = (h ^ np.uint64(b)) * np.uint64(1099511628211)
+    return h
+
+
+@njit(cache=True)
+def _find(table: np.ndarray, hashes: np.ndarray, marks: np.ndarray, m: np.ndarray, h: np.uint64,
+          packed: bool) -> tuple[int, int]:
+    """
+    Look up a marking in the open addressing hash table.
+
+    Args:
+        table: The hash table holding marking IDs (-1 for empty slots).
+        hashes: The hashes of the known markings.
+        marks: The known markings, one per row.
+        m: The marking to look up.
+        h: The hash of m.
+        packed: True if equal hashes mean equal markings.
+
+    Returns:
+        The ID of the marking (-1 if unknown) and the slot it is or would be stored in.
+    """
+    mask = table.shape[0] - 1
+    slot = np.int64(h & np.uint64(mask))
+    while table[slot] != -1:
+        k = table[slot]
+        # Compare the stored hashes first, the rows only on a hash match
+        if hashes[k] == h:
+            if packed:
+                return k, slot
+            same = True
+            for j in range(m.shape[0]):
+                if marks[k, j] != m[j]:
+                    same = False
+                    break
+            if same:
+                return k, slot
+        slot = (slot + 1) & mask
+    return -1, slot
+
+
+@njit(cache=True)
+def _rehash(hashes: np.ndarray, n: int, size: int) -> np.ndarray:
+    """
+    Build a new hash table for the first n markings.
+
+    Args:
+        hashes: The hashes of the known markings.
+        n: The number of known markings.
+        size: The size of the new table (a power of two).
+
+    Returns:
+        The new hash table.
+    """
+    table = np.full(size, -1, dtype=np.int64)
+    mask = size - 1
+    for k in range(n):
+        # The markings are distinct, so only a free slot has to be found
+        slot = np.int64(hashes[k] & np.uint64(mask))
+        while table[slot] != -1:
+            slot = (slot + 1) & mask
+        table[slot] = k
+    return table
+
+
+@njit(cache=True)
+def _covers(a: np.ndarray, b: np.ndarray) -> bool:
+    """
+    Check if marking a has at least as many tokens as marking b on every place.
+    """
+    for j in range(a.shape[0]):
+        if b[j] > a[j]:
+            return False
+    return True
+
+
+@njit(cache=True)
+def _grow(a: np.ndarray) -> np.ndarray:
+    """
+    Double the length of an array along its first axis.
+    """
+    new = np.empty((2 * a.shape[0],) + a.shape[1:], dtype=a.dtype)
+    new[:a.shape[0]] = a
+    return new
+
+
+@njit(cache=True)
+def _sparse_rows(a: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Get the non-zero entries of a matrix row by row (CSR form).
+
+    Args:
+        a: The matrix.
+
+    Returns:
+        The row pointers, the column indices and the values of the non-zero entries.
+    """
+    ptr = np.zeros(a.shape[0] + 1, dtype=np.int64)
+    for i in range(a.shape[0]):
+        ptr[i + 1] = ptr[i] + np.count_nonzero(a[i])
+    idx = np.empty(ptr[-1], dtype=np.int64)
+    w = np.empty(ptr[-1], dtype=a.dtype)
+    k = 0
+    for i in range(a.shape[0]):
+        for j in range(a.shape[1]):
+            if a[i, j] != 0:
+                idx[k] = j
+                w[k] = a[i, j]
+                k += 1
+    return ptr, idx, w
+
+
+@njit(cache=True)
+def _in_range(m: np.ndarray, cap: int) -> bool:
+    """
+    Check if every place of a marking holds between 0 and cap tokens.
+    """
+    for j in range(m.shape[0]):
+        if m[j] < 0 or m[j] > cap:
+            return False
+    return True
+
+
+# Compiled on the first analysis rather than at import, so the window does not wait for numba.
+# Petrinet passes C-contiguous int32 arrays, so that is the one specialization numba builds
+# (and caches on disk) and the loops over a row need no stride handling
+@njit(cache=True)
+def explore(pre: np.ndarray, post: np.ndarray, m0: np.ndarray, cap: int, bits: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int, int, int]:
+    """
+    Explore the reachability graph of a Petri net depth-first.
+
+    Works like the NumPy search in Petrinet._explore_numpy: transitions are tried
+    in order and the search stops as soon as a reached marking is strictly
+    greater than one of its ancestors on the current path.
+
+    Only the places a transition takes tokens from or changes are visited when
+    checking and firing it, the other places of a marking are checked once.
+
+    Args:
+        pre: The pre weights, one row per transition.
+        post: The post weights, one row per transition.
+        m0: The initial marking.
+        cap: The maximum number of tokens per place after subtracting the pre weights.
+        bits: The number of bits per place to pack markings into one 64 bit key,
+            0 if they do not fit.
+
+    Returns:
+        The markings in the order they were visited, the edges as source ID,
+        target ID and transition index arrays, the number of markings that are
+        nodes of the graph (a newly found m is not), and the IDs of m' and m
+        (both -1 if the net is bounded).
+    """
+    n_trans, n_places = pre.shape
+    marks = np.empty((1024, n_places), dtype=np.int32)
+    hashes = np.empty(1024, dtype=np.uint64)
+    table = np.full(2048, -1, dtype=np.int64)
+    packed = bits != 0
+    src = np.empty(1024, dtype=np.int64)
+    dst = np.empty(1024, dtype=np.int64)
+    tr = np.empty(1024, dtype=np.int64)
+    stack_node = np.empty(1024, dtype=np.int64)
+    stack_t = np.empty(1024, dtype=np.int64)
+    stack_sum = np.empty(1024, dtype=np.int64)
+    stack_ok = np.empty(1024, dtype=np.bool_)
+    new_mark = np.empty(n_places, dtype=np.int32)
+    pre_ptr, pre_idx, pre_w = _sparse_rows(pre)
+    d_ptr, d_idx, d_w = _sparse_rows(post - pre)
+
+    marks[0] = m0
+    hashes[0] = _hash_mark(m0, bits)
+    table[np.int64(hashes[0] & np.uint64(table.shape[0] - 1))] = 0
+    n = 1
+    n_edges = 0
+    stack_node[0] = 0
+    stack_t[0] = 0
+    stack_sum[0] = m0.sum()
+    stack_ok[0] = _in_range(m0, cap)
+    depth = 1
+
+    while depth > 0:
+        u = stack_node[depth - 1]
+        t = stack_t[depth - 1]
+
+        # Next transition whose firing leaves a valid marking. If all places of u
+        # are in range only the places with a pre weight can leave it
+        ok = stack_ok[depth - 1]
+        while t < n_trans:
+            valid = True
+            if ok:
+                for q in range(pre_ptr[t], pre_ptr[t + 1]):
+                    v = marks[u, pre_idx[q]] - pre_w[q]
+                    if v < 0 or v > cap:
+                        valid = False
+                        break
+            else:
+                for j in range(n_places):
+                    v = marks[u, j] - pre[t, j]
+                    if v < 0 or v > cap:
+                        valid = False
+                        break
+            if valid:
+                break
+            t += 1
+        if t == n_trans:
+            depth -= 1
+            continue
+        stack_t[depth - 1] = t + 1
+
+        new_mark[:] = marks[u]
+        total = stack_sum[depth - 1]
+        for q in range(d_ptr[t], d_ptr[t + 1]):
+            new_mark[d_idx[q]] += d_w[q]
+            total += d_w[q]
+
+        h = _hash_mark(new_mark, bits)
+        k, slot = _find(table, hashes, marks, new_mark, h, packed)
+        is_new = k == -1
+        if is_new:
+            if n == marks.shape[0]:
+                marks = _grow(marks)
+                hashes = _grow(hashes)
+            k = n
+            marks[k] = new_mark
+            hashes[k] = h
+            n += 1
+            if 2 * n > table.shape[0]:
+                table = _rehash(hashes, n, 2 * table.shape[0])
+            else:
+                table[slot] = k
+
+        if n_edges == src.shape[0]:
+            src = _grow(src)
+            dst = _grow(dst)
+            tr = _grow(tr)
+        src[n_edges] = u
+        dst[n_edges] = k
+        tr[n_edges] = t
+        n_edges += 1
+
+        # A strictly greater marking has more tokens in total than the ancestor, and
+        # with more tokens in total covering the ancestor already means strictly greater
+        for d in range(depth):
+            if stack_sum[d] < total and _covers(new_mark, marks[stack_node[d]]):
+                n_g = n - 1 if is_new else n
+                return marks[:n], src[:n_edges], dst[:n_edges], tr[:n_edges], n_g, stack_node[d], k
+
+        if not is_new:
+            continue
+
+        if depth == stack_node.shape[0]:
+            stack_node = _grow(stack_node)
+            stack_t = _grow(stack_t)
+            stack_sum = _grow(stack_sum)
+            stack_ok = _grow(stack_ok)
+        stack_node[depth] = k
+        stack_t[depth] = 0
+        stack_sum[depth] = total
+        stack_ok[depth] = _in_range(new_mark, cap)
+        depth += 1
+
+    return marks[:n], src[:n_edges], dst[:n_edges], tr[:n_edges], n, -1, -1
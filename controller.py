@@ -4,6 +4,7 @@ from petrinet import Petrinet
 from petri_io import Parser
 from PySide6.QtWidgets import QFileDialog
 from graphic_items import PlaceNode
+from typing import Sequence
 import os
 
 
@@ -19,7 +20,10 @@ class PetriNetController:
         self.net = Petrinet()
         self.view = View(self)
         self.last_selected_place: int | None = None
+        self._last_node: PlaceNode | None = None
         self.file_name: str | None = None
+        # Reachability graphs with more markings are only counted, not drawn
+        self.reach_render_threshold = 2000
         self.open_file_dialog()
 
 
@@ -46,6 +50,7 @@ class PetriNetController:
             file_path: The path to the PNML file.
         """
         self.last_selected_place = None
+        self._last_node = None
 
         self.view.petri_canvas.reset_petrinet_graph()
 
@@ -62,22 +67,24 @@ class PetriNetController:
             mark.append(val)
 
         self.net.update_net(mark, trans)
-        for i, p in enumerate(m):
-            original_id, name, x, y, val = p
-            self.view.petri_canvas.add_place(x, y, val, model_id=i, name=name)
-
-        for i, t in enumerate(t):
-            original_id, name, x, y, pre, post = t
-            self.view.petri_canvas.add_trans(x, y, model_id=i + self.net.places, name=name)
-            for j in range(self.net.places):
-                if pre[j] > 0:
+        self.view.petri_canvas.begin_batch()
+        try:
+            for i, p in enumerate(m):
+                original_id, name, x, y, val = p
+                self.view.petri_canvas.add_place(x, y, val, model_id=i, name=name)
+
+            for i, t in enumerate(t):
+                original_id, name, x, y, pre, post = t
+                self.view.petri_canvas.add_trans(x, y, model_id=i + self.net.places, name=name)
+                for j, _ in self.net.pre_nz[i]:
                     self.view.petri_canvas.add_edge(j, i + self.net.places, '')
-                if post[j] > 0:
+                for j, _ in self.net.post_nz[i]:
                     self.view.petri_canvas.add_edge(i + self.net.places, j, '')
+        finally:
+            self.view.petri_canvas.end_batch()
 
         # reachability_graph
-        reach_canvas_label = str(self.net.mark)
-        self.view.reach_canvas.initialize_graph('(' + reach_canvas_label[1:-1] + ')')
+        self.view.reach_canvas.initialize_graph(self.net.mark_label(self.net.mark))
         self.view.fit_all()
 
 
@@ -88,9 +95,9 @@ class PetriNetController:
         Args:
             t_id: The ID of the transition to fire.
         """
-        prev_mark = '(' + str(self.net.mark)[1:-1] + ')'
+        prev_mark = self.net.mark_label(self.net.mark)
         if self.net.fire_trans(t_id):
-            new_mark = '(' + str(self.net.mark)[1:-1] + ')'
+            new_mark = self.net.mark_label(self.net.mark)
             self.view.reach_canvas.update_graph(new_mark=new_mark, prev_mark=prev_mark, trans_original_id=str(t_id))
             self.view.petri_canvas.update_labels(self.net.mark)
             self.place_clicked(None, None)
@@ -102,8 +109,7 @@ class PetriNetController:
         if self.last_selected_place is not None:
             if self.net.change_mark(1, self.last_selected_place):
                 self.view.petri_canvas.update_labels(self.net.mark)
-                reach_canvas_label = str(self.net.mark)
-                self.view.reach_canvas.initialize_graph('(' + reach_canvas_label[1:-1] + ')')
+                self.view.reach_canvas.initialize_graph(self.net.mark_label(self.net.mark))
 
 
     def subtract_token(self) -> None:
@@ -113,8 +119,7 @@ class PetriNetController:
         if self.last_selected_place is not None:
             if self.net.change_mark(-1, self.last_selected_place):
                 self.view.petri_canvas.update_labels(self.net.mark)
-                reach_canvas_label = str(self.net.mark)
-                self.view.reach_canvas.initialize_graph('(' + reach_canvas_label[1:-1] + ')')
+                self.view.reach_canvas.initialize_graph(self.net.mark_label(self.net.mark))
 
     def place_clicked(self, model_id: int | None, node: PlaceNode | None) -> None:
         """
@@ -129,13 +134,12 @@ class PetriNetController:
             if node is not None:
                 node.set_selected(False)
             self.last_selected_place = None
+            self._last_node = None
             return
 
         # Deselect previous node if it exists
-        if self.last_selected_place is not None:
-            prev_node = self.view.petri_canvas.nodes.get(self.last_selected_place, None)
-            if prev_node is not None and isinstance(prev_node, PlaceNode):
-                prev_node.set_selected(False)
+        if self._last_node is not None:
+            self._last_node.set_selected(False)
 
         # Select the new node
         if node is not None:
@@ -143,6 +147,18 @@ class PetriNetController:
 
         # Update last selected
         self.last_selected_place = model_id
+        self._last_node = node
+
+    def load_marking(self, mark: Sequence[int]) -> None:
+        """
+        Load a marking into the Petri net and highlight it in the reachability graph.
+
+        Args:
+            mark: The marking to load.
+        """
+        self.net.set_mark(mark)
+        self.view.petri_canvas.update_labels(mark)
+        self.view.reach_canvas.highlight_marking(self.net.mark_label(mark))
 
     def load_marking_from_reach_graph(self, marking_str: str) -> None:
         """
@@ -151,10 +167,7 @@ class PetriNetController:
         Args:
             marking_str: The string representation of the marking to load.
         """
-        new_mark = tuple(int(x) for x in marking_str[1:-1].split(','))
-        self.net.set_mark(list(new_mark))
-        self.view.petri_canvas.update_labels(list(new_mark))
-        self.view.reach_canvas.highlight_marking(marking_str)
+        self.load_marking(self.net.label_mark(marking_str))
 
     def analyse(self) -> None:
         """
@@ -189,18 +202,28 @@ class PetriNetController:
         self.view.text_area.append(line + '\n')
 
         # Build reachability graph for net
-        g = self.net.g
-        if g:
-            for mark in g:
-                self.view.reach_canvas.add_marking(str(mark))
-                for new_mark, t_id in g[mark]:
-                    self.view.reach_canvas.update_graph(new_mark=str(new_mark),
-                                                        prev_mark=str(mark),
-                                                        trans_original_id=str(t_id))
-
-        self.load_marking_from_reach_graph(str(self.net.initial_mark))
+        if self.net.marks > self.reach_render_threshold:
+            self.view.text_area.append(f"Reachability graph too large to render: "
+                                       f"{self.net.marks} markings, {self.net.edges} edges\n")
+        elif self.net.marks:
+            # Label every marking once, the CSR arrays refer to them by ID
+            labels = [self.net.mark_label(m) for m in self.net.markings]
+            t_labels = [str(i) for i in range(len(self.net.trans))]
+            indptr = self.net.indptr.tolist()
+            indices = self.net.indices.tolist()
+            edge_trans = self.net.edge_trans.tolist()
+
+            edges = []
+            for u in range(self.net.marks):
+                s_mark = labels[u]
+                for k in range(indptr[u], indptr[u + 1]):
+                    edges.append((s_mark, labels[indices[k]], t_labels[edge_trans[k]]))
+            self.view.reach_canvas.bulk_add(labels[:self.net.marks], edges)
+
+        self.load_marking(self.net.initial_mark)
         if not self.net.bounded:
-            self.view.reach_canvas.highlight_unbounded(str(self.net.m_null), str(self.net.m_last))
+            self.view.reach_canvas.highlight_unbounded(self.net.mark_label(self.net.m_null),
+                                                       self.net.mark_label(self.net.m_last))
 
     def reset_reachability_graph(self) -> None:
         """
@@ -208,8 +231,7 @@ class PetriNetController:
         """
         if self.net.mark is None:
             return
-        self.net.set_mark(list(self.net.initial_mark))
+        self.net.set_mark(self.net.initial_mark)
         self.view.petri_canvas.update_labels(self.net.mark)
         self.view.reach_canvas.reset_graph()
-        reach_canvas_label = str(self.net.mark)
-        self.view.reach_canvas.initialize_graph('(' + reach_canvas_label[1:-1] + ')')
\ No newline at end of file
+        self.view.reach_canvas.initialize_graph(self.net.mark_label(self.net.mark))
\ No newline at end of file
@@ -1,13 +1,87 @@
-from PySide6.QtWidgets import QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsItem, QGraphicsTextItem, QGraphicsLineItem, QStyleOptionGraphicsItem, QWidget
-from PySide6.QtGui import QPen, QPolygonF, QColor, QBrush, QPainter
-from PySide6.QtCore import QPointF
+from PySide6.QtWidgets import QGraphicsEllipseItem, QGraphicsRectItem, QGraphicsItem, QGraphicsTextItem, QGraphicsLineItem, QStyle, QStyleOptionGraphicsItem, QWidget
+from PySide6.QtGui import QPen, QPolygonF, QColor, QBrush, QPainter, QPainterPath, QPainterPathStroker, QStaticText, QFont, QTransform
+from PySide6.QtCore import QPointF, QRectF, Qt
 import math
+from collections import OrderedDict
 from typing import Callable
 
+
+# Margin around a label, as the document margin of a QGraphicsTextItem, so the
+# labels are placed and bounded like the text items they replace
+TEXT_MARGIN = 4
+
+
+def label_rect(pos: QPointF, text: QStaticText) -> QRectF:
+    """
+    Get the area of a label drawn at pos, including its margin.
+
+    Args:
+        pos: The top left corner of the text.
+        text: The label.
+
+    Returns:
+        The rectangle covered by the label.
+    """
+    m = TEXT_MARGIN
+    return QRectF(pos, text.size()).adjusted(-m, -m, m, m)
+
+
+def static_text(text: str, font: QFont) -> QStaticText:
+    """
+    Create a plain text label whose glyph layout is computed once.
+
+    Args:
+        text: The text of the label.
+        font: The font the label is drawn with.
+
+    Returns:
+        The prepared static text.
+    """
+    st = QStaticText(text)
+    st.setTextFormat(Qt.TextFormat.PlainText)
+    st.prepare(QTransform(), font)
+    return st
+
+
+def paint_selection(painter: QPainter, option: QStyleOptionGraphicsItem, rect: QRectF) -> None:
+    """
+    Draw the dashed selection box of a selected shape item around rect.
+
+    Items whose bounding rectangle also covers their labels paint the shape
+    with the selected state cleared and draw the box themselves, so it stays
+    around the shape as Qt draws it for plain ellipse and rectangle items.
+
+    Args:
+        painter: The painter of the item.
+        option: The style option passed to paint().
+        rect: The shape rectangle of the item.
+    """
+    fg = option.palette.windowText().color()
+    bg = QColor(0 if fg.red() > 127 else 255, 0 if fg.green() > 127 else 255, 0 if fg.blue() > 127 else 255)
+    painter.setBrush(Qt.BrushStyle.NoBrush)
+    painter.setPen(QPen(bg, 0, Qt.PenStyle.SolidLine))
+    painter.drawRect(rect)
+    painter.setPen(QPen(option.palette.windowText(), 0, Qt.PenStyle.DashLine))
+    painter.drawRect(rect)
+
+
+# Sizes of the marking labels by text, so labels that are created again (e.g.
+# when the reachability graph is rebuilt) skip measuring their text layout,
+# least recently used first
+TEXT_SIZE_CACHE_SIZE = 4096
+_text_sizes: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+
 class PlaceNode(QGraphicsEllipseItem):
     """
     A graphical item representing a place in a Petri net.
     """
+    __slots__ = ('radius', 'selected', 'edges', 'name', 'model_id', 'on_click', 'tokens',
+                 '_font', '_token_text', '_token_pos', '_name_text', '_name_pos', '_bounds')
+
+    # Token count labels and their centered positions, shared by all places
+    _token_texts: dict[int, tuple[QStaticText, QPointF]] = {}
+
     def __init__(self, x: float, y: float, model_id: int, name: str, on_click: Callable[[int], None] | None = None) -> None:
         """
         Initialize the PlaceNode.
@@ -20,6 +94,7 @@ class PlaceNode(QGraphicsEllipseItem):
             on_click: A callback function to execute when the place is clicked.
         """
         self.radius = 20
+        self._bounds: QRectF | None = None
         super().__init__(-self.radius, -self.radius, 2*self.radius, 2*self.radius)
         self.setPos(x, y)
         self.setBrush(QBrush(QColor("white")))
@@ -27,24 +102,74 @@ class PlaceNode(QGraphicsEllipseItem):
         self.selected = False
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
+        # Moves are reported to the edges; bulk loads suspend the edge updates instead
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        # The node is rasterized once and redrawn from the cache until its brush or labels change
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
         self.edges: list['Edge'] = []
         self.name = name
         self.model_id = model_id
         self.on_click = on_click
 
-        # Token count label inside the circle
-        self.token_label = QGraphicsTextItem(str(0), self)
-        self.token_label.setDefaultTextColor(QColor("black"))
-        self.token_label.setPos(-self.token_label.boundingRect().width() / 2,
-                                -self.token_label.boundingRect().height() / 2)
-        self.label = self.token_label
+        # The labels are painted by paint(), not by child text items
+        self._font = QFont()
+        self._name_text = static_text(name, self._font)
+        name_size = self._name_text.size()
+        self._name_pos = QPointF(-name_size.width() / 2, self.radius + 2 + TEXT_MARGIN)
+        self.set_token_count(0)
+
+    def set_token_count(self, count: int) -> None:
+        """
+        Set the token count shown inside the circle.
+
+        The label is measured once per count; setting the count that is
+        already shown does nothing.
+
+        Args:
+            count: The number of tokens.
+        """
+        if self._bounds is not None and count == self.tokens:
+            return
+        label = self._token_texts.get(count)
+        if label is None:
+            text = static_text(str(count), self._font)
+            size = text.size()
+            label = (text, QPointF(-size.width() / 2, -size.height() / 2))
+            self._token_texts[count] = label
+        self.tokens = count
+        text, self._token_pos = label
+        self._token_text = text
+
+        # The bounding rectangle covers the circle and both labels
+        self.prepareGeometryChange()
+        self._bounds = (super().boundingRect()
+                        .united(label_rect(self._token_pos, text))
+                        .united(label_rect(self._name_pos, self._name_text)))
+        self.update()
+
+    def boundingRect(self) -> QRectF:
+        """
+        Get the bounding rectangle of the place including its labels.
+        """
+        if self._bounds is None:
+            return super().boundingRect()
+        return self._bounds
 
-        # Name label below the circle
-        self.name_label = QGraphicsTextItem(name, self)
-        self.name_label.setDefaultTextColor(QColor("black"))
-        name_rect = self.name_label.boundingRect()
-        self.name_label.setPos(-name_rect.width() / 2, self.radius + 2)
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: QWidget | None = None) -> None:
+        """
+        Paint the circle, the token count and the name.
+        """
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        if selected:
+            option = QStyleOptionGraphicsItem(option)
+            option.state &= ~QStyle.StateFlag.State_Selected
+        super().paint(painter, option, widget)
+        if selected:
+            paint_selection(painter, option, self.rect())
+        painter.setPen(Qt.GlobalColor.black)
+        painter.setFont(self._font)
+        painter.drawStaticText(self._token_pos, self._token_text)
+        painter.drawStaticText(self._name_pos, self._name_text)
 
     def mousePressEvent(self, event) -> None:
         """
@@ -58,7 +183,7 @@ class PlaceNode(QGraphicsEllipseItem):
         """
         Handle item changes, such as position changes.
         """
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged and not Edge.suspend_updates:
             for edge in self.edges:
                 edge.update_position()
         return super().itemChange(change, value)
@@ -79,6 +204,8 @@ class MarkingNode(QGraphicsRectItem):
     """
     A graphical item representing a marking in the reachability graph.
     """
+    __slots__ = ('selected', 'edges', 'model_id', 'on_click', 'label')
+
     def __init__(self, x: float, y: float, marking_str: str, on_click: Callable[[str], None] | None = None) -> None:
         """
         Initialize the MarkingNode.
@@ -91,9 +218,21 @@ class MarkingNode(QGraphicsRectItem):
         """
         super().__init__()
 
-        text_item = QGraphicsTextItem(marking_str)
-        text_rect = text_item.boundingRect()
-        rect_width = max(60, int(text_rect.width()) + 10)
+        # The label is measured once and sizes both the rectangle and its own position
+        self.label = QGraphicsTextItem(marking_str, self)
+        self.label.setDefaultTextColor(QColor("black"))
+        self.label.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+        size = _text_sizes.get(marking_str)
+        if size is None:
+            rect = self.label.boundingRect()
+            size = (rect.width(), rect.height())
+            _text_sizes[marking_str] = size
+            if len(_text_sizes) > TEXT_SIZE_CACHE_SIZE:
+                _text_sizes.popitem(last=False)
+        else:
+            _text_sizes.move_to_end(marking_str)
+        label_width, label_height = size
+        rect_width = max(60, int(label_width) + 10)
         rect_height = 30
 
         self.setRect(-rect_width/2, -rect_height/2, rect_width, rect_height)
@@ -105,16 +244,16 @@ class MarkingNode(QGraphicsRectItem):
         self.selected = False
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
+        # Moves are reported to the edges; bulk loads suspend the edge updates instead
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        # The node is rasterized once and redrawn from the cache until its brush or labels change
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
 
         self.edges: list['Edge'] = []
         self.model_id = marking_str
         self.on_click = on_click
 
-        self.label = QGraphicsTextItem(marking_str, self)
-        self.label.setDefaultTextColor(QColor("black"))
-        label_rect = self.label.boundingRect()
-        self.label.setPos(-label_rect.width()/2, -label_rect.height()/2)
+        self.label.setPos(-label_width/2, -label_height/2)
 
     def mousePressEvent(self, event) -> None:
         """
@@ -128,7 +267,7 @@ class MarkingNode(QGraphicsRectItem):
         """
         Handle item changes, such as position changes.
         """
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged and not Edge.suspend_updates:
             for edge in self.edges:
                 edge.update_position()
         return super().itemChange(change, value)
@@ -137,6 +276,8 @@ class TransitionNode(QGraphicsRectItem):
     """
     A graphical item representing a transition in a Petri net.
     """
+    __slots__ = ('edges', 'model_id', 'on_click', '_font', '_name_text', '_name_pos', '_bounds')
+
     def __init__(self, x: float, y: float, model_id: int, name: str, on_click: Callable[[int], None] | None = None, width: float = 20, height: float = 40) -> None:
         """
         Initialize the TransitionNode.
@@ -150,28 +291,57 @@ class TransitionNode(QGraphicsRectItem):
             width: The width of the transition rectangle.
             height: The height of the transition rectangle.
         """
+        self._bounds: QRectF | None = None
         super().__init__(-width/2, -height/2, width, height)
         self.setPos(x, y)
         self.setBrush(QBrush(QColor("white")))
         self.setPen(QColor("black"))
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
+        # Moves are reported to the edges; bulk loads suspend the edge updates instead
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+        # The node is rasterized once and redrawn from the cache until its brush or labels change
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
         self.edges: list['Edge'] = []
         self.model_id = model_id
         self.on_click = on_click
 
-        self.label = QGraphicsTextItem(name, self)
-        self.label.setDefaultTextColor(QColor("black"))
-        label_rect = self.label.boundingRect()
-        # Position label below the rectangle
-        self.label.setPos(-label_rect.width()/2, self.rect().height()/2 + 2)
+        # Name below the rectangle, painted by paint()
+        self._font = QFont()
+        self._name_text = static_text(name, self._font)
+        name_size = self._name_text.size()
+        self._name_pos = QPointF(-name_size.width()/2, self.rect().height()/2 + 2 + TEXT_MARGIN)
+        self.prepareGeometryChange()
+        self._bounds = super().boundingRect().united(label_rect(self._name_pos, self._name_text))
+
+    def boundingRect(self) -> QRectF:
+        """
+        Get the bounding rectangle of the transition including its name.
+        """
+        if self._bounds is None:
+            return super().boundingRect()
+        return self._bounds
+
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: QWidget | None = None) -> None:
+        """
+        Paint the rectangle and the name.
+        """
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        if selected:
+            option = QStyleOptionGraphicsItem(option)
+            option.state &= ~QStyle.StateFlag.State_Selected
+        super().paint(painter, option, widget)
+        if selected:
+            paint_selection(painter, option, self.rect())
+        painter.setPen(Qt.GlobalColor.black)
+        painter.setFont(self._font)
+        painter.drawStaticText(self._name_pos, self._name_text)
 
     def itemChange(self, change: QGraphicsItem.GraphicsItemChange, value) -> object:
         """
         Handle item changes, such as position changes.
         """
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged and not Edge.suspend_updates:
             for edge in self.edges:
                 edge.update_position()
         return super().itemChange(change, value)
@@ -188,6 +358,22 @@ class Edge(QGraphicsLineItem):
     """
     A graphical item representing an edge (arc) in a Petri net or reachability graph.
     """
+    __slots__ = ('source', 'target', 'label', 'arrow_size', 'arrow_head',
+                 '_start_offset', '_end_offset', '_last_start', '_last_end', '_ux', '_uy',
+                 '_bounding_rect', '_shape')
+
+    # cos/sin of the 30 degree half-angle of an arrow head
+    COS30 = math.cos(math.pi / 6)
+    SIN30 = math.sin(math.pi / 6)
+
+    # While True, edges are not moved with their nodes; set by the canvases while
+    # adding many items, which then update every edge once
+    suspend_updates = False
+
+    # Shared by all edges, so paint() does not create them on every call
+    PEN = QPen(QColor("black"), 2)
+    ARROW_BRUSH = QBrush(QColor("black"))
+
     def __init__(self, source: PlaceNode | TransitionNode | MarkingNode, target: PlaceNode | TransitionNode | MarkingNode, label: str) -> None:
         """
         Initialize the Edge.
@@ -198,24 +384,60 @@ class Edge(QGraphicsLineItem):
             label: The label of the edge.
         """
         super().__init__()
+        # Geometry caches, reset whenever the line moves
+        self._bounding_rect: QRectF | None = None
+        self._shape: QPainterPath | None = None
         self.source = source
         self.target = target
         self.label = label
-        self.setPen(QPen(QColor("black"), 2))
+        self.setPen(self.PEN)
+        self._bounding_rect = None
         self.arrow_size = 10
 
         self.source.edges.append(self)
         self.target.edges.append(self)
         self.arrow_head = QPolygonF()
 
+        # Node outlines do not change, so their offsets are computed only once
+        self._start_offset = self._node_offset(self.source)
+        self._end_offset = self._node_offset(self.target)
+        self._last_start: QPointF | None = None
+        self._last_end: QPointF | None = None
+        self._ux = 1.0
+        self._uy = 0.0
+
         self.update_position()
 
+    @staticmethod
+    def _node_offset(node: PlaceNode | TransitionNode | MarkingNode) -> float:
+        """
+        Get the distance from a node's center at which an edge starts or ends.
+
+        Args:
+            node: The node the edge is attached to.
+
+        Returns:
+            The radius for places, half of the larger side for rectangles.
+        """
+        if hasattr(node, "radius"):  # Kreis
+            return node.radius
+        return max(node.rect().width(), node.rect().height()) / 2
+
     def update_position(self) -> None:
         """
         Update the position of the edge based on the source and target positions.
+
+        Does nothing if neither endpoint has moved since the last update, or
+        while suspend_updates is set.
         """
+        if self.suspend_updates:
+            return
         start = self.source.scenePos()
         end = self.target.scenePos()
+        if start == self._last_start and end == self._last_end:
+            return
+        self._last_start = start
+        self._last_end = end
 
         dx = end.x() - start.x()
         dy = end.y() - start.y()
@@ -223,52 +445,78 @@ class Edge(QGraphicsLineItem):
         if length == 0:
             return
 
-        if hasattr(self.source, "radius"):  # Kreis
-            start_offset = self.source.radius
-        else:
-            start_offset = max(self.source.rect().width(), self.source.rect().height()) / 2
+        inv = 1.0 / length
+        ux = dx * inv
+        uy = dy * inv
 
-        if hasattr(self.target, "radius"):
-            end_offset = self.target.radius
-        else:
-            end_offset = max(self.target.rect().width(), self.target.rect().height()) / 2
+        start_x = start.x() + ux * self._start_offset
+        start_y = start.y() + uy * self._start_offset
+        end_x = end.x() - ux * self._end_offset
+        end_y = end.y() - uy * self._end_offset
 
-        start_x = start.x() + dx / length * start_offset
-        start_y = start.y() + dy / length * start_offset
-        end_x = end.x() - dx / length * end_offset
-        end_y = end.y() - dy / length * end_offset
+        # The line points backwards if the nodes overlap
+        if length < self._start_offset + self._end_offset:
+            ux, uy = -ux, -uy
+        self._ux = ux
+        self._uy = uy
 
         self.setLine(start_x, start_y, end_x, end_y)
+        self._bounding_rect = None
+        self._shape = None
         self.update_arrow()
 
     def update_arrow(self) -> None:
         """
         Update the arrow head of the edge.
+
+        The two back corners are the line direction rotated by +-30 degrees,
+        computed from the unit vector stored by update_position().
         """
         line = self.line()
-        dx = line.x2() - line.x1()
-        dy = line.y2() - line.y1()
-        angle = math.atan2(dy, dx)
-
-        p1 = QPointF(
-            line.x2() - self.arrow_size * math.cos(angle - math.pi / 6),
-            line.y2() - self.arrow_size * math.sin(angle - math.pi / 6)
-        )
-        p2 = QPointF(
-            line.x2() - self.arrow_size * math.cos(angle + math.pi / 6),
-            line.y2() - self.arrow_size * math.sin(angle + math.pi / 6)
-        )
-
-        self.arrow_head = QPolygonF([QPointF(line.x2(), line.y2()), p1, p2])
+        x2 = line.x2()
+        y2 = line.y2()
+
+        # Scaled rotation table: both corners share these four products
+        c = self.arrow_size * self.COS30
+        s = self.arrow_size * self.SIN30
+        cx = self._ux * c
+        cy = self._uy * c
+        sx = self._ux * s
+        sy = self._uy * s
+
+        p1 = QPointF(x2 - (cx + sy), y2 - (cy - sx))
+        p2 = QPointF(x2 - (cx - sy), y2 - (cy + sx))
+
+        self.arrow_head = QPolygonF([QPointF(x2, y2), p1, p2])
         self.update()
 
-    def boundingRect(self):
+    def boundingRect(self) -> QRectF:
         """
-        Get the bounding rectangle of the edge.
+        Get the bounding rectangle of the edge, including the arrow head.
+
+        The rectangle is computed once per position of the line.
+        """
+        if self._bounding_rect is None:
+            extra = self.arrow_size + 2
+            self._bounding_rect = super().boundingRect().adjusted(-extra, -extra, extra, extra)
+        return self._bounding_rect
+
+    def shape(self) -> QPainterPath:
+        """
+        Get the shape of the edge: the stroked line and the arrow head.
+
+        The shape is computed once per position of the line.
         """
-        extra = self.arrow_size + 2
-        rect = super().boundingRect()
-        return rect.adjusted(-extra, -extra, extra, extra)
+        if self._shape is None:
+            line = self.line()
+            path = QPainterPath(line.p1())
+            path.lineTo(line.p2())
+            stroker = QPainterPathStroker()
+            stroker.setWidth(self.pen().widthF())
+            shape = stroker.createStroke(path)
+            shape.addPolygon(self.arrow_head)
+            self._shape = shape
+        return self._shape
 
     def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: QWidget | None = None) -> None:
         """
@@ -276,6 +524,6 @@ class Edge(QGraphicsLineItem):
         """
         super().paint(painter, option, widget)
         if self.arrow_head:
-            painter.setBrush(QColor("black"))
-            painter.setPen(QPen(QColor("black"), 2))
+            painter.setBrush(self.ARROW_BRUSH)
+            painter.setPen(self.PEN)
             painter.drawPolygon(self.arrow_head)
\ No newline at end of file
@@ -1,4 +1,5 @@
 from pathlib import Path
+import sys
 import xml.etree.ElementTree as ET
 from typing import Any
 
@@ -7,6 +8,13 @@ class Parser:
     A class for parsing PNML (Petri Net Markup Language) files.
     """
 
+    # Paths of the labels below a place, transition or arc. They are direct children
+    # in PNML, so the lookups don't search the whole subtree
+    NAME_TEXT = "name/text"
+    POSITION = "graphics/position"
+    MARKING_TEXT = "initialMarking/text"
+    INSCRIPTION_TEXT = "inscription/text"
+
     def __init__(self) -> None:
         """
         Initialize the Parser.
@@ -15,7 +23,6 @@ class Parser:
         self.trans: list[dict[str, Any]] = []
         self.edges: list[dict[str, Any]] = []
         self.mark: dict[str, int] = {}
-        self.root: ET.Element | None = None
 
     def validate(self) -> bool:
         """
@@ -27,27 +34,33 @@ class Parser:
         Raises:
             ValueError: If duplicates, invalid arcs, or invalid markings are found.
         """
-        # 1. Duplikate prüfen
-        place_ids = [p['id'] for p in self.places]
-        trans_ids = [t['id'] for t in self.trans]
-
-        if len(place_ids) != len(set(place_ids)):
-            raise ValueError("Duplikate bei Place-IDs gefunden.")
-        if len(trans_ids) != len(set(trans_ids)):
-            raise ValueError("Duplikate bei Transition-IDs gefunden.")
+        # 1. Duplikate prüfen, die IDs werden dabei in Sets gesammelt
+        place_ids: set[str] = set()
+        for p in self.places:
+            if p['id'] in place_ids:
+                raise ValueError("Duplikate bei Place-IDs gefunden.")
+            place_ids.add(p['id'])
+        trans_ids: set[str] = set()
+        for t in self.trans:
+            if t['id'] in trans_ids:
+                raise ValueError("Duplikate bei Transition-IDs gefunden.")
+            trans_ids.add(t['id'])
 
         # 2. Arc-Quellen/Ziele prüfen
-        valid_ids = set(place_ids) | set(trans_ids)
         for arc in self.edges:
             src = arc['src']
             dst = arc['dst']
-            if src not in valid_ids:
+            src_is_place = src in place_ids
+            dst_is_place = dst in place_ids
+            src_is_trans = src in trans_ids
+            dst_is_trans = dst in trans_ids
+            if not (src_is_place or src_is_trans):
                 raise ValueError(f"Arc-Quelle '{src}' existiert nicht.")
-            if dst not in valid_ids:
+            if not (dst_is_place or dst_is_trans):
                 raise ValueError(f"Arc-Ziel '{dst}' existiert nicht.")
 
             # 3. Prüfen Richtung der Kante
-            if (src in place_ids and dst in place_ids) or (src in trans_ids and dst in trans_ids):
+            if (src_is_place and dst_is_place) or (src_is_trans and dst_is_trans):
                 raise ValueError(
                     f"Ungültige Kante: {src} → {dst}. Kanten dürfen nur Place → Transition oder Transition → Place sein.")
 
@@ -58,13 +71,16 @@ class Parser:
             elif tokens < 0:
                 raise ValueError(f"Initial Marking ungültig '{tokens}'.")
 
-        print("Parser-Validierung erfolgreich.")
         return True
 
     def parse(self, file: str) -> tuple[list[tuple[str, str, float, float, int]], list[tuple[str, str, float, float, tuple[int, ...], tuple[int, ...]]]]:
         """
         Parse a PNML file.
 
+        The file is read in a single streaming pass; every place, transition and
+        arc is processed as soon as it is complete and then cleared, so the
+        whole XML tree is never held in memory.
+
         Args:
             file: The path to the PNML file.
 
@@ -84,17 +100,29 @@ class Parser:
             raise ValueError(f"Kein gültiger Dateipfad: {file}")
 
         try:
-            tree = ET.parse(path)
-            self.root = tree.getroot()
+            with open(path, "rb", buffering=1 << 20) as f:
+                for _, elem in ET.iterparse(f, events=("end",)):
+                    tag = elem.tag
+                    if "}" in tag:
+                        # Strip the namespace so the lookups inside the element stay simple
+                        tag = elem.tag = tag.rsplit("}", 1)[1]
+                    if tag == "place":
+                        self.parse_place(elem)
+                        self.parse_initial_marking(elem)
+                        elem.clear()
+                    elif tag == "transition":
+                        self.parse_trans(elem)
+                        elem.clear()
+                    elif tag == "arc":
+                        self.parse_edge(elem)
+                        elem.clear()
+                    elif tag == "net":
+                        elem.clear()
         except ET.ParseError as e:
             raise ValueError(f"Ungültiges XML: {e}")
-        except Exception as e:
+        except OSError as e:
             raise IOError(f"Datei konnte nicht gelesen werden: {e}")
 
-        self.parse_places()
-        self.parse_trans()
-        self.parse_edges()
-        self.parse_initial_marking()
         self.validate()
 
         return self.get_controller_data()
@@ -119,87 +147,134 @@ class Parser:
 
         transitions_tup = []
         num_places = len(self.places)
+        trans_index = {t["id"]: i for i, t in enumerate(self.trans)}
 
-        for t in self.trans:
+        # Pre/post weights of all transitions in one flat list, row i belongs to transition i.
+        # The arcs are visited once, a later arc between the same nodes overwrites an earlier one
+        pre = [0] * (len(self.trans) * num_places)
+        post = [0] * (len(self.trans) * num_places)
+        for arc in self.edges:
+            src, dst, w = arc["src"], arc["dst"], arc["weight"]
+            if dst in trans_index and src in place_index:
+                pre[trans_index[dst] * num_places + place_index[src]] = w
+            if src in trans_index and dst in place_index:
+                post[trans_index[src] * num_places + place_index[dst]] = w
+
+        for i, t in enumerate(self.trans):
             tid, name, x, y = t["id"], t["name"], t["x"], t["y"]
-            pre = [0] * num_places
-            post = [0] * num_places
+            row = slice(i * num_places, (i + 1) * num_places)
+            transitions_tup.append((tid, name, x, y, tuple(pre[row]), tuple(post[row])))
 
-            for arc in self.edges:
-                src, dst, w = arc["src"], arc["dst"], arc["weight"]
-                if dst == tid and src in place_index:
-                    pre[place_index[src]] = w
-                if src == tid and dst in place_index:
-                    post[place_index[dst]] = w
+        return places_tup, transitions_tup
 
-            transitions_tup.append((tid, name, x, y, tuple(pre), tuple(post)))
 
-        return places_tup, transitions_tup
+    @staticmethod
+    def _intern(s: str | None) -> str | None:
+        """
+        Intern an ID, so the dict and set lookups on it compare by identity.
 
+        Args:
+            s: The ID, None if the attribute is missing.
 
-    def parse_places(self) -> None:
+        Returns:
+            The interned ID, or None.
         """
-        Parse places from the XML root.
+        return sys.intern(s) if s is not None else None
+
+    @staticmethod
+    def _parse_int(text: str | None, default: int) -> int:
         """
-        if self.root is None:
-            return
-        for p in self.root.findall(".//place"):
-            pid = p.get("id")
-            name_elem = p.find(".//name//text")
-            name = name_elem.text.strip() if name_elem is not None and name_elem.text else pid
+        Parse the integer text of an inscription or initial marking.
 
-            pos_elem = p.find(".//graphics//position")
-            x = float(pos_elem.get("x", 0)) if pos_elem is not None else 0.0
-            y = float(pos_elem.get("y", 0)) if pos_elem is not None else 0.0
+        Plain digits are converted directly, only other text goes through the
+        exception handling of int().
 
-            self.places.append({"id": pid, "name": name, "x": x, "y": y})
+        Args:
+            text: The element text, None if the element is missing.
+            default: The value for a missing, empty or invalid text.
 
-    def parse_trans(self) -> None:
+        Returns:
+            The parsed integer, or the default.
         """
-        Parse transitions from the XML root.
+        if not text:
+            return default
+        text = text.strip()
+        if text.isdecimal():
+            return int(text)
+        try:
+            return int(text)
+        except ValueError:
+            return default
+
+    @staticmethod
+    def _parse_position(pos_elem: ET.Element | None) -> tuple[float, float]:
         """
-        if self.root is None:
-            return
-        for t in self.root.findall(".//transition"):
-            tid = t.get("id")
-            name_elem = t.find(".//name//text")
-            name = name_elem.text.strip() if name_elem is not None and name_elem.text else tid
+        Parse the coordinates of a position element.
 
-            pos_elem = t.find(".//graphics//position")
-            x = float(pos_elem.get("x", 0)) if pos_elem is not None else 0.0
-            y = float(pos_elem.get("y", 0)) if pos_elem is not None else 0.0
+        Args:
+            pos_elem: The position element, None if it is missing.
 
-            self.trans.append({"id": tid, "name": name, "x": x, "y": y})
+        Returns:
+            The x and y coordinates, 0.0 for a missing attribute.
+        """
+        if pos_elem is None:
+            return 0.0, 0.0
+        xs = pos_elem.get("x")
+        ys = pos_elem.get("y")
+        return float(xs) if xs else 0.0, float(ys) if ys else 0.0
 
-    def parse_edges(self) -> None:
+    def parse_place(self, p: ET.Element) -> None:
         """
-        Parse arcs (edges) from the XML root.
+        Parse a place element.
+
+        Args:
+            p: The place element.
+        """
+        pid = self._intern(p.get("id"))
+        name = p.findtext(self.NAME_TEXT)
+        name = name.strip() if name else pid
+
+        x, y = self._parse_position(p.find(self.POSITION))
+
+        self.places.append({"id": pid, "name": name, "x": x, "y": y})
+
+    def parse_trans(self, t: ET.Element) -> None:
         """
-        if self.root is None:
-            return
-        for a in self.root.findall(".//arc"):
-            src = a.get("source")
-            dst = a.get("target")
-            inscription_elem = a.find(".//inscription//text")
-            try:
-                weight = int(inscription_elem.text.strip()) if inscription_elem is not None and inscription_elem.text else 1
-            except:
-                weight = 1
-            self.edges.append({"src": src, "dst": dst, "weight": weight})
+        Parse a transition element.
 
-    def parse_initial_marking(self) -> None:
+        Args:
+            t: The transition element.
         """
-        Parse initial markings from the XML root.
+        tid = self._intern(t.get("id"))
+        name = t.findtext(self.NAME_TEXT)
+        name = name.strip() if name else tid
+
+        x, y = self._parse_position(t.find(self.POSITION))
+
+        self.trans.append({"id": tid, "name": name, "x": x, "y": y})
+
+    def parse_edge(self, a: ET.Element) -> None:
+        """
+        Parse an arc (edge) element.
+
+        Args:
+            a: The arc element.
+        """
+        src = self._intern(a.get("source"))
+        dst = self._intern(a.get("target"))
+        weight = self._parse_int(a.findtext(self.INSCRIPTION_TEXT), 1)
+        self.edges.append({"src": src, "dst": dst, "weight": weight})
+
+    def parse_initial_marking(self, p: ET.Element) -> None:
+        """
+        Parse the initial marking of a place element.
+
+        Args:
+            p: The place element.
         """
-        if self.root is None:
-            return
-        for p in self.root.findall(".//place"):
-            pid = p.get("id")
-            im = p.find(".//initialMarking//text")
-            if im is not None and im.text:
-                try:
-                    m = int(im.text.strip())
-                except:
-                    m = 0
-                if pid:
-                    self.mark[pid] = m
\ No newline at end of file
+        pid = self._intern(p.get("id"))
+        im = p.findtext(self.MARKING_TEXT)
+        if im:
+            m = self._parse_int(im, 0)
+            if pid:
+                self.mark[pid] = m
\ No newline at end of file
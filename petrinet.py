@@ -1,23 +1,71 @@
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+from analysis_numba import HAS_NUMBA, explore
+
+
 class Petrinet:
     """
     A class representing a Petri net.
+
+    The marking and the pre/post weights of the transitions are stored as
+    NumPy int32 arrays, one row per transition. If numba is installed, the
+    reachability graph is explored by the compiled search in analysis_numba.
+
+    The reachability graph is stored in CSR form: the successors of marking
+    markings[u] are markings[indices[k]] for k in range(indptr[u], indptr[u + 1]),
+    reached by firing transition edge_trans[k].
     """
 
+    # Maximum number of tokens per place for a transition to be enabled
+    MAX_TOKENS = 10000
+    # Number of (marking, transition) results fire_trans() remembers
+    SUCC_CACHE_SIZE = 1 << 16
+    # Number of markings whose successors the NumPy search remembers between analyses
+    EXPAND_CACHE_SIZE = 1 << 14
+    # Number of (structure, initial marking) analysis results analysis() remembers
+    ANALYSIS_CACHE_SIZE = 8
+
     def __init__(self) -> None:
         """
         Initialize the Petri net with default values.
         """
         self.trans = None
         self.mark = None
-        self.initial_mark = None
+        self._initial_mark = None
+        # True if the initial marking is the current marking but not copied yet
+        self._initial_dirty = False
         self.places = None
-        self.g = None
+        self.markings = None
+        self.indptr = None
+        self.indices = None
+        self.edge_trans = None
         self.bounded = None
         self.m_null = None
         self.m_last = None
-        self.ids = None
         self.marks = None
         self.edges = None
+        self.pre = None
+        self.post = None
+        self.delta = None
+        self.pre_nz = None
+        self.post_nz = None
+        # Scratch buffers for the marking minus the pre weights, reused by every step
+        self._buf = None
+        self._fire_buf = None
+        self._mark_str_cache: dict[tuple[int, ...], str] = {}
+        self._str_to_mark: dict[str, tuple[int, ...]] = {}
+        self._struct_key = None
+        # (marking bytes, transition ID) -> marking after firing, None if not enabled,
+        # least recently used first
+        self._succ_map: OrderedDict[tuple[bytes, int], np.ndarray | None] = OrderedDict()
+        # marking bytes -> (enabled transition indices, successor markings), least recently used first
+        self._expand_map: OrderedDict[bytes, tuple[list[int], np.ndarray]] = OrderedDict()
+        # (structure, initial marking) -> (markings, indptr, indices, edge_trans, bounded, marks, edges, m_null, m_last),
+        # least recently used first
+        self._analysis_cache: OrderedDict[tuple, tuple] = OrderedDict()
 
 
     def update_net(self, m: list[int], t: list[tuple[tuple[int, ...], tuple[int, ...]]]) -> None:
@@ -29,19 +77,94 @@ class Petrinet:
             t: The transitions of the Petri net.
         """
         self.trans = t
-        self.mark = m
+        self.mark = np.array(m, dtype=np.int32)
         self.initial_mark = tuple(m)
         self.places = len(m)
-        self.g = {}
+        # One conversion of all (pre, post) pairs, then contiguous (T, P) matrices of each
+        weights = np.array(t, dtype=np.int32).reshape(len(t), 2, self.places)
+        self.pre = np.ascontiguousarray(weights[:, 0])
+        self.post = np.ascontiguousarray(weights[:, 1])
+        self.delta = self.post - self.pre
+        self._buf = np.empty_like(self.pre)
+        self._fire_buf = np.empty(self.places, dtype=np.int32)
+        self._struct_key = (self.pre.shape, self.pre.tobytes(), self.post.tobytes())
+        self.markings = []
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int64)
+        self.edge_trans = np.zeros(0, dtype=np.int64)
         self.bounded = None
         self.m_null = None
         self.m_last = None
         self.marks = 0
         self.edges = 0
+        self._mark_str_cache = {}
+        self._str_to_mark = {}
+        self._succ_map = OrderedDict()
+        self._expand_map = OrderedDict()
+
+        # Sparse (place, weight) lists of the non-zero arc weights per transition
+        self.pre_nz = [[(j, w) for j, w in enumerate(t_pre) if w] for t_pre, _ in self.trans]
+        self.post_nz = [[(j, w) for j, w in enumerate(t_post) if w] for _, t_post in self.trans]
+
+    @property
+    def initial_mark(self) -> tuple[int, ...] | None:
+        """
+        The initial marking of the reachability analysis.
+
+        Token changes make the current marking the initial one; it is copied
+        only when it is read or before the marking changes otherwise.
+        """
+        self._copy_initial()
+        return self._initial_mark
+
+    @initial_mark.setter
+    def initial_mark(self, m: tuple[int, ...] | None) -> None:
+        self._initial_mark = m
+        self._initial_dirty = False
+
+    def _copy_initial(self) -> None:
+        """
+        Copy the current marking to the initial marking if a token change is pending.
+        """
+        if self._initial_dirty:
+            self._initial_mark = tuple(self.mark.tolist())
+            self._initial_dirty = False
+
+    def mark_label(self, m: list[int] | tuple[int, ...] | np.ndarray) -> str:
+        """
+        Get the display label of a marking, e.g. '(1, 0, 2)'.
 
-        self.ids = {}
-        for i, tr in enumerate(self.trans):
-            self.ids[self.places + i] = tr
+        Labels are cached per marking, so repeated lookups of the same marking
+        (e.g. while building the reachability graph) do not rebuild the string.
+
+        Args:
+            m: The marking to get the label for.
+
+        Returns:
+            The string representation of the marking.
+        """
+        t = tuple(m.tolist()) if isinstance(m, np.ndarray) else tuple(m)
+        s = self._mark_str_cache.get(t)
+        if s is None:
+            s = '(' + ', '.join(map(str, t)) + ')'
+            self._mark_str_cache[t] = s
+            self._str_to_mark[s] = t
+        return s
+
+    def label_mark(self, label: str) -> tuple[int, ...]:
+        """
+        Get the marking for a label created by mark_label().
+
+        Args:
+            label: The string representation of the marking.
+
+        Returns:
+            The marking.
+        """
+        t = self._str_to_mark.get(label)
+        if t is None:
+            t = tuple(map(int, label[1:-1].split(',')))
+        return t
 
     def change_mark(self, amount: int, place: int) -> bool:
         """
@@ -56,132 +179,310 @@ class Petrinet:
         """
         if 0 <= place < self.places and self.mark[place] + amount >= 0:
             self.mark[place] += amount
-            self.initial_mark = tuple(self.mark)
+            self._initial_dirty = True
             return True
         return False
 
-    def set_mark(self, new_mark: list[int]) -> None:
+    def set_mark(self, new_mark: list[int] | tuple[int, ...]) -> None:
         """
         Set the marking of the Petri net to a new marking.
 
         Args:
             new_mark: The new marking to set.
         """
-        for i in range(len(self.mark)):
-            self.mark[i] = new_mark[i]
+        self._copy_initial()
+        self.mark[:] = new_mark
 
     def fire_trans(self, t_id: int) -> bool:
         """
         Fire a transition if it is enabled.
 
+        The result of firing a transition in a marking is remembered (for the
+        SUCC_CACHE_SIZE most recently used pairs), so firing it again in the same
+        marking only copies the known successor. A transition lacking tokens in
+        one of its input places is rejected without computing the whole marking.
+
         Args:
             t_id: The ID of the transition to fire.
 
         Returns:
             True if the transition was fired, False otherwise.
         """
-        if t_id not in self.ids:
+        # Transition IDs follow the place IDs
+        i = t_id - self.places
+        if not 0 <= i < len(self.trans):
             return False
-        t_pre, t_post = self.ids[t_id]
-        tmp = tuple(p1 - p2 for p1, p2 in zip(self.mark, t_pre))
-        if self._valid_mark(tmp):
-            self.mark = [p1 + p2 for p1, p2 in zip(tmp, t_post)]
-            return True
-        else: return False
+        key = (self.mark.tobytes(), t_id)
+        if key in self._succ_map:
+            self._succ_map.move_to_end(key)
+            new_mark = self._succ_map[key]
+        else:
+            if any(self.mark[j] < w for j, w in self.pre_nz[i]):
+                new_mark = None
+            else:
+                tmp = np.subtract(self.mark, self.pre[i], out=self._fire_buf)
+                # Checked by two reductions instead of temporary boolean arrays,
+                # only the remembered successor needs its own array
+                valid = tmp.min(initial=0) >= 0 and tmp.max(initial=0) <= self.MAX_TOKENS
+                new_mark = np.add(self.mark, self.delta[i]) if valid else None
+            self._succ_map[key] = new_mark
+            if len(self._succ_map) > self.SUCC_CACHE_SIZE:
+                self._succ_map.popitem(last=False)
+        if new_mark is None:
+            return False
+        self._copy_initial()
+        self.mark[:] = new_mark
+        return True
 
     def analysis(self) -> None:
         """
         Analyze the Petri net to build the reachability graph and check for boundedness.
+
+        The search stops at the first marking m that is strictly greater than an
+        ancestor m' on its path (the Karp-Miller criterion), so an unbounded net
+        is reported as soon as a pumpable path is found. Together with the
+        MAX_TOKENS bound this keeps the explored graph finite without replacing
+        token counts by omega.
+
+        The results are cached per net structure and initial marking, so analysing
+        the same net and marking again reuses the previous graph (for the
+        ANALYSIS_CACHE_SIZE most recently analysed ones).
         """
-        visit = set()
-        path = []
-        self.mark = list(self.initial_mark)
-        self.g = {}
+        self.mark = np.array(self.initial_mark, dtype=np.int32)
+        cache_key = (self._struct_key, self.initial_mark)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            self._analysis_cache.move_to_end(cache_key)
+            (self.markings, self.indptr, self.indices, self.edge_trans,
+             self.bounded, self.marks, self.edges, self.m_null, self.m_last) = cached
+            return
+
         self.marks = 0
         self.edges = 0
         self.bounded = None
         self.m_null = None
         self.m_last = None
+        if HAS_NUMBA:
+            self.bounded = self._explore_compiled()
+        else:
+            self.bounded = self._explore_numpy()
+        self._analysis_cache[cache_key] = (self.markings, self.indptr, self.indices, self.edge_trans,
+                                           self.bounded, self.marks, self.edges, self.m_null, self.m_last)
+        if len(self._analysis_cache) > self.ANALYSIS_CACHE_SIZE:
+            self._analysis_cache.popitem(last=False)
 
-        def dfs(mark: tuple[int, ...]) -> bool:
-            if mark in visit:
-                return True
-            visit.add(mark)
-
-            if self._infinite(path, mark):
-                return False
-
-            path.append(mark)
-            self.g[mark] = set()
-            self.marks += 1
-            for i, t in enumerate(self.trans):
-                t_pre, t_post = t
-                tmp = tuple(p1 - p2 for p1, p2 in zip(mark, t_pre))
-                if self._valid_mark(tmp):
-                    tmp = tuple(p1 + p2 for p1, p2 in zip(tmp, t_post))
-                    self.g[mark].add((tmp, i))
-                    self.edges += 1
-                    if not dfs(tmp):
-                        return False
-            path.pop()
-            return True
+    def _explore_numpy(self) -> bool:
+        """
+        Build the reachability graph with an iterative depth-first search.
 
+        Every marking on the stack holds an iterator over its successors, which
+        are computed for all transitions at once when the marking is entered.
+        The search keeps its own stack, so no Python frame is created per marking
+        and deep nets do not run into the recursion limit.
 
-        if dfs(tuple(self.mark)):
-            self.bounded = True
-        else:
-            self.bounded = False
+        Returns:
+            True if the net is bounded, False otherwise.
+        """
+        # Markings are interned to integer IDs at first sight, the edges refer to them by ID.
+        # The key is the marking packed into one integer if it fits into 64 bits,
+        # else its raw bytes
+        id_of: dict[int | bytes, int] = {}
+        nodes = []
+        totals = []
+        src = array('q')
+        dst = array('q')
+        tr = array('q')
 
+        bits = self._pack_bits()
+        shifts = np.arange(self.places, dtype=np.uint64) * np.uint64(bits)
 
-    @staticmethod
-    def _valid_mark(mark: tuple[int, ...]) -> bool:
+        def keys_of(marks: np.ndarray) -> list[int | bytes]:
+            if bits:
+                # The fields do not overlap, so the sum is the bitwise or of all places
+                return (marks.astype(np.uint64) << shifts).sum(axis=-1, dtype=np.uint64).tolist()
+            return [m.tobytes() for m in marks]
+
+        def intern(mark: np.ndarray, key: int | bytes) -> tuple[int, bool]:
+            u = id_of.get(key)
+            if u is not None:
+                return u, False
+            u = len(nodes)
+            id_of[key] = u
+            node = tuple(mark.tolist())
+            nodes.append(node)
+            totals.append(sum(node))
+            return u, True
+
+        # With non-negative pre weights, mark - pre never exceeds mark, so the upper
+        # bound only has to be checked for markings above MAX_TOKENS
+        pre_nonneg = not (self.pre < 0).any()
+
+        expand_map = self._expand_map
+
+        def successors(mark: np.ndarray):
+            # The successors only depend on the structure, so markings expanded by an
+            # earlier analysis (e.g. before a token change) are looked up
+            raw = mark.tobytes()
+            known = expand_map.get(raw)
+            if known is not None:
+                expand_map.move_to_end(raw)
+                enabled, succs = known
+                return zip(enabled, succs, keys_of(succs))
+            # Subtract the pre weights of all transitions at once, one row per transition,
+            # and add the post weights of the enabled ones to get all successors. The
+            # difference goes to a shared buffer, the successors are new arrays
+            tmp = np.subtract(mark, self.pre, out=self._buf)
+            if pre_nonneg and mark.max(initial=0) <= self.MAX_TOKENS:
+                enabled = np.flatnonzero((tmp >= 0).all(axis=1))
+            else:
+                enabled = np.flatnonzero(self._valid_mark(tmp))
+            succs = tmp[enabled] + self.post[enabled]
+            enabled = enabled.tolist()
+            expand_map[raw] = (enabled, succs)
+            if len(expand_map) > self.EXPAND_CACHE_SIZE:
+                expand_map.popitem(last=False)
+            return zip(enabled, succs, keys_of(succs))
+
+        mark = self.mark.copy()
+        u, _ = intern(mark, keys_of(mark[None])[0])
+        # The markings on the current path and their token totals, one row per stack entry
+        path_marks = np.empty((64, self.places), dtype=np.int32)
+        path_sums = np.empty(64, dtype=np.int64)
+        path_marks[0] = mark
+        path_sums[0] = totals[u]
+        stack = [(u, successors(mark))]
+        self.marks = 1
+        bounded = True
+        while stack:
+            u, succs = stack[-1]
+            nxt = next(succs, None)
+            if nxt is None:
+                stack.pop()
+                continue
+            i, new_mark, key = nxt
+            v, new = intern(new_mark, key)
+            src.append(u)
+            dst.append(v)
+            tr.append(i)
+            # The ancestors are checked for every reached marking, also for already
+            # visited ones, otherwise a marking covering an ancestor might be missed
+            depth = len(stack)
+            if self._infinite(path_marks[:depth], path_sums[:depth], new_mark, totals[v]):
+                bounded = False
+                break
+            if new:
+                if depth == path_sums.shape[0]:
+                    path_marks = np.concatenate((path_marks, np.empty_like(path_marks)))
+                    path_sums = np.concatenate((path_sums, np.empty_like(path_sums)))
+                path_marks[depth] = new_mark
+                path_sums[depth] = totals[v]
+                stack.append((v, successors(new_mark)))
+                self.marks += 1
+
+        # A newly found m is interned last, as it is never entered it has no edges
+        self.edges = len(src)
+        self._set_graph(nodes, np.frombuffer(src, dtype=np.int64),
+                        np.frombuffer(dst, dtype=np.int64), np.frombuffer(tr, dtype=np.int64))
+        return bounded
+
+    def _set_graph(self, nodes: list[tuple[int, ...]], src, dst, tr) -> None:
         """
-        Check if a marking is valid (all places have non-negative tokens and <= 10000).
+        Store the reachability graph in CSR form.
 
         Args:
-            mark: The marking to check.
+            nodes: The markings, indexed by their ID.
+            src: The source marking ID of every edge.
+            dst: The target marking ID of every edge.
+            tr: The transition index of every edge.
+        """
+        n = len(nodes)
+        src = np.asarray(src, dtype=np.int64)
+        # Edges of the same source keep their order, i.e. the order of the transitions
+        order = np.argsort(src, kind='stable')
+        self.markings = nodes
+        self.indices = np.asarray(dst, dtype=np.int64)[order]
+        self.edge_trans = np.asarray(tr, dtype=np.int64)[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=self.indptr[1:])
+
+    def _explore_compiled(self) -> bool:
+        """
+        Build the reachability graph with the compiled search from analysis_numba.
 
         Returns:
-            True if the marking is valid, False otherwise.
+            True if the net is bounded, False otherwise.
         """
-        if any((p < 0 or p > 10000) for p in mark):
-            return False
-        return True
+        marks, src, dst, tr, n_g, m_null, m_last = explore(self.pre, self.post, self.mark, self.MAX_TOKENS,
+                                                           self._pack_bits())
+        nodes = [tuple(m) for m in marks.tolist()]
+        self._set_graph(nodes, src, dst, tr)
+        self.marks = n_g
+        self.edges = len(src)
 
-    @staticmethod
-    def _a_greater_b(a: tuple[int, ...], b: tuple[int, ...]) -> bool:
+        if m_last == -1:
+            return True
+        self.m_null = nodes[m_null]
+        self.m_last = nodes[m_last]
+        return False
+
+
+    def _pack_bits(self) -> int:
         """
-        Check if marking a is strictly greater than marking b.
+        Get the number of bits per place to pack a reachable marking into 64 bits.
+
+        After firing a transition a place holds at most MAX_TOKENS plus the
+        largest post weight, only the initial marking may hold more.
+
+        Returns:
+            The number of bits per place, 0 if the markings do not fit into 64 bits.
+        """
+        if self.mark.min(initial=0) < 0 or self.post.min(initial=0) < 0:
+            return 0
+        top = max(self.MAX_TOKENS + int(self.post.max(initial=0)), int(self.mark.max(initial=0)))
+        bits = top.bit_length()
+        return bits if bits * self.places <= 64 else 0
+
+    @classmethod
+    def _valid_mark(cls, mark: np.ndarray) -> np.ndarray:
+        """
+        Check if a marking is valid (all places have non-negative tokens and <= MAX_TOKENS).
 
         Args:
-            a: The first marking.
-            b: The second marking.
+            mark: The marking to check, or a 2D array with one marking per row.
 
         Returns:
-            True if a > b, False otherwise.
+            True if the marking is valid, False otherwise (one value per row for 2D input).
         """
-        one_greater = False
-        for ai, bi in zip(a, b):
-            if bi > ai:
-                return False
-            if ai > bi:
-                one_greater = True
-        return one_greater
+        return ((mark >= 0) & (mark <= cls.MAX_TOKENS)).all(axis=-1)
 
-    def _infinite(self, path: list[tuple[int, ...]], mark: tuple[int, ...]) -> bool:
+    def _infinite(self, path_marks: np.ndarray, path_sums: np.ndarray, mark: np.ndarray, total: int) -> bool:
         """
         Check if the current path leads to an infinite marking (unbounded).
 
+        This is the Karp-Miller criterion: a marking that is strictly greater
+        than an ancestor can be pumped without bound. Only ancestors with fewer
+        tokens in total can be strictly smaller, and for those mark >= ancestor
+        on every place already means strictly greater. All ancestors are
+        compared at once.
+
         Args:
-            path: The current path of markings in the DFS.
+            path_marks: The markings on the current path of the DFS, one per row.
+            path_sums: The total number of tokens of these markings.
             mark: The current marking.
+            total: The total number of tokens of the current marking.
 
         Returns:
             True if an infinite marking is detected, False otherwise.
         """
-        for prev_mark in path:
-            if self._a_greater_b(mark, prev_mark):
-                self.m_null = prev_mark
-                self.m_last = mark
-                return True
-        return False
\ No newline at end of file
+        smaller = np.flatnonzero(path_sums < total)
+        if smaller.size == 0:
+            return False
+        # Compare against the path itself if every ancestor passed, instead of a copy of its rows
+        rows = path_marks if smaller.size == path_sums.shape[0] else path_marks[smaller]
+        covered = smaller[(mark >= rows).all(axis=1)]
+        if covered.size == 0:
+            return False
+        # The first ancestor on the path, like the place by place search did
+        self.m_null = tuple(path_marks[covered[0]].tolist())
+        self.m_last = tuple(mark.tolist())
+        return True
@@ -1,3 +1,6 @@
+from typing import Sequence
+
+from PySide6.QtCore import QPoint, QTimer
 from PySide6.QtGui import QPainter, QWheelEvent
 from PySide6.QtWidgets import QGraphicsView, QGraphicsScene, QWidget
 
@@ -22,8 +25,22 @@ class PetrinetCanvas(QGraphicsView):
         self.controller = controller
         self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
+        self.setOptimizationFlags(QGraphicsView.OptimizationFlag.DontAdjustForAntialiasing
+                                  | QGraphicsView.OptimizationFlag.DontSavePainterState)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+        self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
         self.nodes: dict[int, PlaceNode | TransitionNode] = {}
-        self.edges: dict[int, Edge] = {}
+        self.edges: dict[tuple[int, int], Edge] = {}
+        self._prev_index_method = self.scene.itemIndexMethod()
+        # The marking shown by the place labels, None if unknown
+        self._shown_mark: tuple[int, ...] | None = None
+        # Wheel steps are collected and applied as one zoom per frame
+        self._pending_zoom = 1.0
+        self._zoom_pos = QPoint()
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(16)
+        self._zoom_timer.timeout.connect(self._apply_zoom)
 
     def add_place(self, x: float, y: float, val: int, model_id: int, name: str) -> None:
         """
@@ -43,12 +60,9 @@ class PetrinetCanvas(QGraphicsView):
         )
         p.on_click = lambda mid=model_id, node_ref=p: self.controller.place_clicked(mid, node_ref)
         self.scene.addItem(p)
-        p.label.setPlainText(str(val))
-        p.label.setPos(-p.label.boundingRect().width() / 2,
-                       -p.label.boundingRect().height() / 2)
-        self.scene.update()
-        self.viewport().update()
+        p.set_token_count(val)
         self.nodes[model_id] = p
+        self._shown_mark = None
 
     def add_trans(self, x: float, y: float, model_id: int, name: str) -> None:
         """
@@ -62,8 +76,6 @@ class PetrinetCanvas(QGraphicsView):
         """
         t = TransitionNode(x, y, model_id, name, on_click=lambda tid=model_id: self.controller.fire_trans(tid))
         self.scene.addItem(t)
-        self.scene.update()
-        self.viewport().update()
         self.nodes[model_id] = t
 
     def add_edge(self, source_id: int, target_id: int, label: str) -> None:
@@ -77,9 +89,32 @@ class PetrinetCanvas(QGraphicsView):
         """
         e = Edge(self.nodes[source_id], self.nodes[target_id], label)
         self.scene.addItem(e)
+        self.edges[(source_id, target_id)] = e
+
+    def begin_batch(self) -> None:
+        """
+        Prepare the canvas for adding many items at once.
+
+        Disables the scene index, repaints and edge updates until end_batch() is called.
+        As nothing is painted in between, the render hints (e.g. antialiasing) are
+        left as they are.
+        """
+        self._prev_index_method = self.scene.itemIndexMethod()
+        self.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        self.setUpdatesEnabled(False)
+        Edge.suspend_updates = True
+
+    def end_batch(self) -> None:
+        """
+        Place every edge once, restore the scene index and repaint the canvas
+        after a bulk insertion.
+        """
+        Edge.suspend_updates = False
+        for edge in self.edges.values():
+            edge.update_position()
+        self.scene.setItemIndexMethod(self._prev_index_method)
+        self.setUpdatesEnabled(True)
         self.scene.update()
-        self.viewport().update()
-        self.edges[source_id + target_id] = e
 
     def fit_all(self) -> None:
         """
@@ -95,32 +130,55 @@ class PetrinetCanvas(QGraphicsView):
             bounding_rect.height() + 2 * padding
         )
 
-    def update_labels(self, mark: list[int]) -> None:
+    def update_labels(self, mark: Sequence[int]) -> None:
         """
         Update the token labels on place nodes.
 
+        Only the labels of places whose token count differs from the shown
+        marking are rewritten.
+
         Args:
             mark: The current marking (list of token counts).
         """
-        for p_id, val in enumerate(mark):
+        t = tuple(map(int, mark))
+        prev = self._shown_mark
+        if t == prev:
+            return
+        self._shown_mark = t
+        for p_id, val in enumerate(t):
+            if prev is not None and prev[p_id] == val:
+                continue
             p = self.nodes[p_id]
             if isinstance(p, PlaceNode):
-                p.label.setPlainText(str(val))
-                p.label.setPos(-p.label.boundingRect().width() / 2, -p.label.boundingRect().height() / 2)
+                p.set_token_count(val)
 
     def wheelEvent(self, event: QWheelEvent) -> None:
         """
         Handle mouse wheel events for zooming.
 
+        The zoom steps of all events within one frame are applied together by
+        _apply_zoom().
+
         Args:
             event: The wheel event.
         """
         zoom_in_factor = 1.01
         zoom_out_factor = 0.99
 
-        pos = event.position().toPoint()
+        self._pending_zoom *= zoom_in_factor if event.angleDelta().y() > 0 else zoom_out_factor
+        self._zoom_pos = event.position().toPoint()
+        if not self._zoom_timer.isActive():
+            self._zoom_timer.start()
+        event.accept()
+
+    def _apply_zoom(self) -> None:
+        """
+        Zoom by the collected wheel steps, keeping the scene point under the cursor in place.
+        """
+        zoom_factor = self._pending_zoom
+        self._pending_zoom = 1.0
+        pos = self._zoom_pos
         cursor_scene_pos = self.mapToScene(pos)
-        zoom_factor = zoom_in_factor if event.angleDelta().y() > 0 else zoom_out_factor
         self.scale(zoom_factor, zoom_factor)
 
         new_cursor_pos = self.mapToScene(pos)
@@ -133,4 +191,5 @@ class PetrinetCanvas(QGraphicsView):
         """
         self.scene.clear()
         self.nodes.clear()
-        self.edges.clear()
\ No newline at end of file
+        self.edges.clear()
+        self._shown_mark = None
\ No newline at end of file
@@ -1,4 +1,5 @@
 # reachability_graph.py
+from PySide6.QtCore import QPoint, QTimer
 from PySide6.QtWidgets import QGraphicsScene, QGraphicsView
 from PySide6.QtGui import QBrush, QPainter, QColor
 from graphic_items import Edge, MarkingNode
@@ -7,17 +8,35 @@ from graphic_items import Edge, MarkingNode
 class ReachabilityGraphView(QGraphicsView):
     def __init__(self, controller, parent=None):
         self.scene = QGraphicsScene()
+        # Every new marking moves the nodes of its layer, for such a dynamic scene
+        # (at most reach_render_threshold markings) a linear item list is cheaper than the BSP tree
+        self.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
         super().__init__(self.scene, parent)
         self.controller = controller
         self.setRenderHint(QPainter.RenderHint.Antialiasing)
         self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setOptimizationFlags(QGraphicsView.OptimizationFlag.DontAdjustForAntialiasing
+                                  | QGraphicsView.OptimizationFlag.DontSavePainterState)
+        self.setViewportUpdateMode(QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+        self.setCacheMode(QGraphicsView.CacheModeFlag.CacheBackground)
         self.current_marking = None
+        # Markings are keyed by their labels. Petrinet.mark_label() returns the same str
+        # object for a marking every time, so its hash is computed once and lookups
+        # compare by identity
         self.nodes = {}
         self.edges = {}
         self.parents = {}  # child_marking -> list of parent markings
         self.layer_nodes = {}  # layer -> list of marking strings
         self.layers = {}
         self.layer_counts = {}
+        self._prev_index_method = self.scene.itemIndexMethod()
+        # Wheel steps are collected and applied as one zoom per frame
+        self._pending_zoom = 1.0
+        self._zoom_pos = QPoint()
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(16)
+        self._zoom_timer.timeout.connect(self._apply_zoom)
 
     def initialize_graph(self, mark: str):
         self.reset_graph()
@@ -31,7 +50,41 @@ class ReachabilityGraphView(QGraphicsView):
 
     def update_graph(self, new_mark, prev_mark, trans_original_id):
         self.add_marking(marking_str=new_mark)
-        # Register parent relation
+        for m_id, x, y in self._assign_layer(new_mark, prev_mark, lambda m: self.nodes[m].x()):
+            self.nodes[m_id].setPos(x, y)
+        self.add_edge(prev_mark, new_mark, trans_original_id=trans_original_id)
+        self.highlight_marking(new_mark)
+
+    def bulk_add(self, markings, edges):
+        # Same result as add_marking() for every marking followed by update_graph()
+        # for every (prev_mark, new_mark, trans_original_id) edge, but the layout is
+        # computed on plain coordinates and every node is moved only once at the end.
+        self.begin_batch()
+        try:
+            for marking_str in markings:
+                self.add_marking(marking_str)
+            xs = {m: node.x() for m, node in self.nodes.items()}
+            ys = {}
+            last = None
+            for prev_mark, new_mark, trans_original_id in edges:
+                if new_mark not in self.nodes:
+                    self.add_marking(new_mark)
+                    xs[new_mark] = 0
+                for m_id, x, y in self._assign_layer(new_mark, prev_mark, xs.__getitem__):
+                    xs[m_id] = x
+                    ys[m_id] = y
+                self.add_edge(prev_mark, new_mark, trans_original_id=trans_original_id)
+                last = new_mark
+            for m_id, y in ys.items():
+                self.nodes[m_id].setPos(xs[m_id], y)
+        finally:
+            self.end_batch()
+        if last is not None:
+            self.highlight_marking(last)
+
+    def _assign_layer(self, new_mark, prev_mark, x_of):
+        # Register the parent relation and, for a new layer member, return the
+        # (marking, x, y) positions of all nodes in its layer
         if new_mark not in self.parents:
             self.parents[new_mark] = []
         if prev_mark not in self.parents[new_mark]:
@@ -42,51 +95,59 @@ class ReachabilityGraphView(QGraphicsView):
             new_layer = self.layers[prev_mark] + 1
             self.layers[new_mark] = new_layer
 
-            if new_layer not in self.layer_nodes:
-                self.layer_nodes[new_layer] = []
-            self.layer_nodes[new_layer].append(new_mark)
-
-            sortable = []
-            for mark in self.layer_nodes[new_layer]:
-                px = []
-                for p in self.parents.get(mark, []):
-                    if p in self.nodes:
-                        px.append(self.nodes[p].x())
-                if px:
-                    px.sort()
-                    median_x = px[len(px) // 2]
-                else:
-                    median_x = 0
-                sortable.append((median_x, mark))
-            sortable.sort(key=lambda t: t[0])
-
-            self.layer_nodes[new_layer] = [t[1] for t in sortable]
+            members = self.layer_nodes.setdefault(new_layer, [])
+            members.append(new_mark)
+
+            # Order the layer by the median x of each node's parents. The sort is stable and
+            # sorts the list in place, which is still in the order of the previous layout,
+            # so usually only the new node is out of place and the sort is linear
+            parents = self.parents
+            nodes = self.nodes
+            medians = {}
+            for mark in members:
+                px = sorted(x_of(p) for p in parents.get(mark, ()) if p in nodes)
+                medians[mark] = px[len(px) // 2] if px else 0
+            members.sort(key=medians.__getitem__)
+
             spacing = 200
-            total = len(self.layer_nodes[new_layer])
+            total = len(members)
             offset = -((total - 1) * spacing) / 2  # center the layer
-
-            for idx, m_id in enumerate(self.layer_nodes[new_layer]):
-                x = offset + idx * spacing
-                y = new_layer * 120
-                self.nodes[m_id].setPos(x, y)
-        self.add_edge(prev_mark, new_mark, trans_original_id=trans_original_id)
-        self.highlight_marking(new_mark)
+            y = new_layer * 120
+
+            return [(m_id, offset + idx * spacing, y) for idx, m_id in enumerate(members)]
+        return []
+
+    def begin_batch(self):
+        # Disable the scene index, repaints and edge updates while many items are added.
+        # Nothing is painted in between, so antialiasing can stay on
+        self._prev_index_method = self.scene.itemIndexMethod()
+        self.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
+        self.setUpdatesEnabled(False)
+        Edge.suspend_updates = True
+
+    def end_batch(self):
+        # Every edge is placed once, before the index is rebuilt
+        Edge.suspend_updates = False
+        for edge in self.edges.values():
+            edge.update_position()
+        self.scene.setItemIndexMethod(self._prev_index_method)
+        self.setUpdatesEnabled(True)
+        self.scene.update()
 
     def add_marking(self, marking_str):
         if marking_str in self.nodes:
             return
         marking = MarkingNode(0, 0, marking_str, on_click=lambda m=marking_str: self.controller.load_marking_from_reach_graph(m))
         self.scene.addItem(marking)
-        self.scene.update()
-        self.viewport().update()
         self.nodes[marking_str] = marking
 
 
     def add_edge(self, source_item_id, target_item_id, trans_original_id):
-        edge_id = source_item_id + trans_original_id + target_item_id
+        # Keyed by the tuple, concatenated strings of different markings could collide
+        edge_id = (source_item_id, trans_original_id, target_item_id)
         if edge_id in self.edges:
             return
-        edge = Edge(self.nodes[source_item_id], self.nodes[target_item_id], edge_id)
+        edge = Edge(self.nodes[source_item_id], self.nodes[target_item_id], trans_original_id)
         self.edges[edge_id] = edge
         self.scene.addItem(edge)
 
@@ -94,9 +155,18 @@ class ReachabilityGraphView(QGraphicsView):
     def wheelEvent(self, event):
         zoom_in_factor = 1.01
         zoom_out_factor = 0.99
-        pos = event.position().toPoint()
+        self._pending_zoom *= zoom_in_factor if event.angleDelta().y() > 0 else zoom_out_factor
+        self._zoom_pos = event.position().toPoint()
+        if not self._zoom_timer.isActive():
+            self._zoom_timer.start()
+        event.accept()
+
+    def _apply_zoom(self):
+        # Zoom by all wheel steps of the last frame around the cursor position
+        zoom_factor = self._pending_zoom
+        self._pending_zoom = 1.0
+        pos = self._zoom_pos
         cursor_scene_pos = self.mapToScene(pos)
-        zoom_factor = zoom_in_factor if event.angleDelta().y() > 0 else zoom_out_factor
         self.scale(zoom_factor, zoom_factor)
         new_cursor_pos = self.mapToScene(pos)
         delta = new_cursor_pos - cursor_scene_pos